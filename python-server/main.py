@@ -1,153 +1,566 @@
 import asyncio
-import json
 import logging
+import mmap
 import os
+import re
+import uuid
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Set
+from typing import Any, Dict, List, Set
 
+import orjson
 import websockets
+import zstandard as zstd
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed when REDIS_URL is set
+    aioredis = None
 
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s %(message)s")
+# The format above never shows these, so skip collecting them for every record.
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+_log = logging.getLogger(__name__)
 
 PORT = int(os.environ.get("PORT", "8765"))
 HOST = os.environ.get("HOST", "0.0.0.0")
 DATA_DIR = Path(os.environ.get("DATA_DIR", Path(__file__).parent / "data"))
+SEND_TIMEOUT = float(os.environ.get("SEND_TIMEOUT", "5"))
+SAVE_DELAY = float(os.environ.get("SAVE_DELAY", "0.5"))
+ZSTD_LEVEL = int(os.environ.get("ZSTD_LEVEL", "3"))
+MAX_OUTBOX = int(os.environ.get("MAX_OUTBOX", "256"))
+BATCH_WINDOW = float(os.environ.get("BATCH_WINDOW", "0.001"))
+PARTICIPANTS_DELAY = float(os.environ.get("PARTICIPANTS_DELAY", "0.1"))
+# Same 1 MiB default as websockets; raise it for very large maps.
+MAX_MESSAGE_SIZE = int(os.environ.get("MAX_MESSAGE_SIZE", str(1024 * 1024)))
+DIRECT_WRITE_LIMIT = int(os.environ.get("DIRECT_WRITE_LIMIT", str(64 * 1024)))
+# When set, session state lives in Redis and updates fan out to every worker through pub/sub.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+WORKER_ID = uuid.uuid4().hex.encode()
 
 @dataclass
 class Session:
-    clients: Set[Any] = field(default_factory=set)
-    client_ids: dict[Any, str] = field(default_factory=dict)
+    path: Path
+    # Clients live in a list for cheap iteration, mirrored by a set for membership checks.
+    # client_ids[i] is the id reported by clients[i].
+    clients: List[Any] = field(default_factory=list)
+    client_set: Set[Any] = field(default_factory=set)
+    client_ids: List[str] = field(default_factory=list)
     last_project: dict | None = None
+    # Set once the persisted snapshot has been looked up, so an empty session doesn't retry it on every message.
+    loaded: bool = False
+    # lastUpdatedAt of last_project, kept alongside it so stale-update checks skip the dict lookup.
+    last_ts: float = 0
+    revision: int = 0
+    dirty_project: dict | None = None
+    pending_save: asyncio.Task | None = None
+    participants_task: asyncio.Task | None = None
+    # Pre-encoded reply, built once when the session is created.
+    no_snapshot_text: str = ""
+    # Our own Redis publishes for this session that haven't echoed back through pub/sub yet.
+    inflight_publishes: int = 0
+
+    def add_client(self, ws: Any, client_id: str):
+        if ws not in self.client_set:
+            self.client_set.add(ws)
+            self.clients.append(ws)
+            self.client_ids.append(client_id)
+
+    def rename_client(self, ws: Any, client_id: str):
+        if ws in self.client_set:
+            self.client_ids[self.clients.index(ws)] = client_id
+
+    def remove_client(self, ws: Any):
+        if ws in self.client_set:
+            self.client_set.discard(ws)
+            # Order doesn't matter, so swap the last client into the hole instead of shifting the tail.
+            i = self.clients.index(ws)
+            self.clients[i] = self.clients[-1]
+            self.clients.pop()
+            self.client_ids[i] = self.client_ids[-1]
+            self.client_ids.pop()
+
+
+@dataclass
+class Outbox:
+    """Encoded messages waiting for a connection's writer task."""
+    queue: asyncio.Queue
+    sending: bool = False
+
 
 sessions: Dict[str, Session] = {}
+outboxes: Dict[Any, Outbox] = {}
+
+_redis: Any = None
+# Sessions whose state changed since the publisher last pushed them to Redis.
+_unpublished: Dict[str, Session] = {}
+_publish_wakeup = asyncio.Event()
+
+
+def _dumps(payload: Any) -> str:
+    # Browsers expect text frames, so hand websockets a str rather than bytes.
+    return orjson.dumps(payload).decode()
+
+
+_loads = orjson.loads
+
+# Replies whose bytes never change are encoded once at import.
+_PONG = _dumps({"type": "pong"})
+_ERR_NOT_OBJECT = _dumps({"type": "error", "message": "expected a JSON object"})
+_ERR_SESSION_ID = _dumps({"type": "error", "message": "sessionId required"})
+_zdctx = zstd.ZstdDecompressor()
+# \w is exactly str.isalnum() plus "_", so this matches the old per-character filter.
+_UNSAFE_CHARS = re.compile(r"[^\w.-]")
 
 
 def safe_session_id(session_id: str) -> str:
-    return "".join(c if c.isalnum() or c in "-_." else "_" for c in session_id) or "session"
+    return _UNSAFE_CHARS.sub("_", session_id) or "session"
 
 
 def session_file(session_id: str) -> Path:
-    return DATA_DIR / f"session-{safe_session_id(session_id)}.json"
+    return DATA_DIR / f"session-{safe_session_id(session_id)}.json.zst"
 
 
-def load_session_project(session_id: str) -> dict | None:
-    path = session_file(session_id)
-    if not path.exists():
-        return None
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as exc:
-        logging.warning("Failed to load session file %s: %s", path, exc)
-        return None
+def load_session_project(path: Path) -> dict | None:
+    # Fall back to plain JSON snapshots written before compression was introduced.
+    for candidate, compressed in ((path, True), (path.with_suffix(""), False)):
+        try:
+            # Map the file rather than reading it so the parser works straight off the page cache.
+            with candidate.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return _loads(_zdctx.decompress(view) if compressed else view)
+        except FileNotFoundError:
+            continue
+        except Exception as exc:
+            _log.warning("Failed to load session file %s: %s", candidate, exc)
+            return None
+    return None
+
+
+def _pointer(path: str) -> list[str]:
+    if path and not path.startswith("/"):
+        raise ValueError(f"invalid JSON pointer: {path!r}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in path.split("/")[1:]]
+
+
+def apply_patch(doc: Any, ops: list) -> Any:
+    """Apply JSON-Patch style ``add``/``remove``/``replace`` ops to ``doc`` in place."""
+    for op in ops:
+        if not isinstance(op, dict) or not isinstance(op.get("path"), str):
+            raise ValueError("malformed op: expected an object with a string path")
+        kind = op.get("op")
+        keys = _pointer(op["path"])
+        if not keys:
+            if kind not in {"add", "replace"}:
+                raise ValueError(f"cannot {kind} document root")
+            doc = op["value"]
+            continue
+        parent = doc
+        for key in keys[:-1]:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        key = keys[-1]
+        if isinstance(parent, list):
+            index = len(parent) if key == "-" and kind == "add" else int(key)
+            if not 0 <= index < len(parent) + (kind == "add"):
+                raise IndexError(f"index out of range: {op['path']}")
+            if kind == "add":
+                parent.insert(index, op["value"])
+            elif kind == "remove":
+                del parent[index]
+            elif kind == "replace":
+                parent[index] = op["value"]
+            else:
+                raise ValueError(f"unsupported op: {kind!r}")
+        elif isinstance(parent, dict):
+            if kind == "add":
+                parent[key] = op["value"]
+            elif kind == "remove":
+                del parent[key]
+            elif kind == "replace":
+                if key not in parent:
+                    raise KeyError(key)
+                parent[key] = op["value"]
+            else:
+                raise ValueError(f"unsupported op: {kind!r}")
+        else:
+            raise TypeError(f"cannot index into {type(parent).__name__} at {op['path']}")
+    return doc
 
 
-def save_session_project(session_id: str, project: dict):
+def save_session_project(path: Path, data: bytes):
     try:
         DATA_DIR.mkdir(parents=True, exist_ok=True)
-        path = session_file(session_id)
         tmp_path = path.with_suffix(".tmp")
-        with tmp_path.open("w", encoding="utf-8") as f:
-            json.dump(project, f, ensure_ascii=False)
+        # Compressors aren't safe to share across threads, and saves for different sessions may overlap.
+        tmp_path.write_bytes(zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data))
         tmp_path.replace(path)
     except Exception as exc:
-        logging.warning("Failed to save session %s: %s", session_id, exc)
+        _log.warning("Failed to save session file %s: %s", path, exc)
+
+
+def schedule_save(session_id: str, session: Session, project: dict):
+    if _redis is not None:
+        return  # the publisher keeps the Redis copy current
+    # Coalesce bursts of updates into a single write per SAVE_DELAY window.
+    session.dirty_project = project
+    if session.pending_save is None:
+        session.pending_save = asyncio.create_task(_flush_later(session_id, session, SAVE_DELAY))
+
+
+async def _flush_later(session_id: str, session: Session, delay: float):
+    try:
+        await asyncio.sleep(delay)
+        project, session.dirty_project = session.dirty_project, None
+        if project is not None:
+            # Encode on the loop so the worker thread only does file I/O.
+            await asyncio.to_thread(save_session_project, session.path, orjson.dumps(project))
+    finally:
+        session.pending_save = None
+        # The session was kept alive for this write after its last client left.
+        if not session.clients and sessions.get(session_id) is session:
+            sessions.pop(session_id, None)
+
+
+def flush_dirty_sessions():
+    # Debounced saves still waiting out SAVE_DELAY would be lost on shutdown; write them now.
+    for session in sessions.values():
+        project, session.dirty_project = session.dirty_project, None
+        if project is not None:
+            save_session_project(session.path, orjson.dumps(project))
+
 
-async def send_json(ws: Any, payload: dict) -> bool:
+def _close_slow(ws: Any, reason: str):
+    _log.warning("Dropping slow client %s: %s", ws.remote_address, reason)
+    outboxes.pop(ws, None)
+    asyncio.create_task(ws.close(1013, "client too slow"))
+
+
+def enqueue(ws: Any, data: str) -> bool:
+    outbox = outboxes.get(ws)
+    if outbox is None:
+        return False
     try:
-        await ws.send(json.dumps(payload))
+        outbox.queue.put_nowait(data)
         return True
-    except Exception as exc:
-        logging.warning("Failed to send message: %s", exc)
+    except asyncio.QueueFull:
+        _close_slow(ws, "outbox full")
         return False
 
-async def broadcast(session_id: str, payload: dict, skip: Any | None = None):
+
+def send_json(ws: Any, payload: dict) -> bool:
+    return enqueue(ws, _dumps(payload))
+
+
+async def _writer(ws: Any, outbox: Outbox):
+    """Drain a client's outbox, folding whatever has piled up into one batch frame."""
+    queue = outbox.queue
+    try:
+        while True:
+            msgs = [await queue.get()]
+            outbox.sending = True
+            await asyncio.sleep(BATCH_WINDOW)
+            while not queue.empty():
+                msgs.append(queue.get_nowait())
+            # Messages are already encoded JSON, so the batch is assembled without re-serializing.
+            data = msgs[0] if len(msgs) == 1 else '{"type":"batch","msgs":[' + ",".join(msgs) + "]}"
+            await asyncio.wait_for(ws.send(data), SEND_TIMEOUT)
+            outbox.sending = False
+    except asyncio.TimeoutError:
+        _close_slow(ws, "send timed out")
+    except websockets.ConnectionClosed:
+        pass
+
+
+def broadcast(session_id: str, payload: dict, skip: Any | None = None):
+    # Encode once; every client receives the same text.
+    broadcast_text(session_id, _dumps(payload), skip)
+
+
+def broadcast_text(session_id: str, data: str, skip: Any | None = None):
     session = sessions.get(session_id)
     if not session:
         return
-    for client in list(session.clients):
-        if skip and client is skip:
+    direct = []
+    for client in session.clients:
+        if client is skip:
             continue
-        ok = await send_json(client, payload)
-        if not ok:
-            session.clients.discard(client)
+        outbox = outboxes.get(client)
+        if outbox is None:
+            continue
+        # Idle clients with a drained socket take the frame immediately; anyone with a backlog
+        # goes through their queue so ordering and slow-peer eviction still apply.
+        if not outbox.sending and outbox.queue.empty() and client.transport.get_write_buffer_size() < DIRECT_WRITE_LIMIT:
+            direct.append(client)
+        else:
+            enqueue(client, data)
+    if direct:
+        # Encodes the text to UTF-8 once and writes the frame to each connection without a task per client.
+        websockets.broadcast(direct, data)
+
+def relay(session_id: str, data: str, skip: Any | None = None):
+    """Broadcast a project-state message locally and queue the session for the other workers."""
+    broadcast_text(session_id, data, skip)
+    if _redis is not None and session_id not in _unpublished:
+        session = sessions.get(session_id)
+        if session is not None:
+            _unpublished[session_id] = session
+            session.inflight_publishes += 1
+            _publish_wakeup.set()
+
+
+async def load_shared_project(session_id: str) -> dict | None:
+    try:
+        data = await _redis.get(f"sess:{session_id}:proj")
+        return None if data is None else _loads(data)
+    except Exception as exc:
+        _log.warning("Failed to load session %s from Redis: %s", session_id, exc)
+        return None
+
+
+async def _publisher():
+    """Push changed sessions to Redis, one SET+PUBLISH per session per wakeup, all in one MULTI/EXEC."""
+    while True:
+        await _publish_wakeup.wait()
+        _publish_wakeup.clear()
+        batch = dict(_unpublished)
+        _unpublished.clear()
+        try:
+            # The SET and PUBLISH must land back to back: if another worker's pair interleaved, peers
+            # would converge on one state while the stored copy that late joiners load holds the other.
+            pipe = _redis.pipeline(transaction=True)
+            for session_id, session in batch.items():
+                data = orjson.dumps(session.last_project)
+                pipe.set(f"sess:{session_id}:proj", data)
+                pipe.publish(f"sess:{session_id}:chan", WORKER_ID + b"\n" + data)
+            await pipe.execute()
+        except Exception as exc:
+            _log.warning("Failed to publish %d session(s) to Redis: %s", len(batch), exc)
+            for session in batch.values():
+                session.inflight_publishes -= 1
+
+
+async def _subscriber():
+    """Apply project snapshots published by other workers and relay them to local clients."""
+    while True:
+        pubsub = _redis.pubsub()
+        try:
+            await pubsub.psubscribe("sess:*:chan")
+            async for message in pubsub.listen():
+                _apply_remote(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            _log.warning("Redis subscription lost, resubscribing: %s", exc)
+            # Echoes of publishes sent before the drop will never arrive; only the queued ones still will.
+            for session_id, session in sessions.items():
+                session.inflight_publishes = 1 if session_id in _unpublished else 0
+        finally:
+            await pubsub.reset()
+        await asyncio.sleep(1)
+
+
+def _apply_remote(message: dict):
+    if message["type"] != "pmessage":
+        return
+    session_id = message["channel"].decode()[len("sess:"):-len(":chan")]
+    sender, _, data = message["data"].partition(b"\n")
+    session = sessions.get(session_id)
+    if session is None:
+        return
+    if sender == WORKER_ID:
+        session.inflight_publishes = max(0, session.inflight_publishes - 1)
+        return
+    # Redis delivers publishes in one global order. A publish of ours still pending lands after
+    # this one and supersedes it, so dropping it keeps every worker on the same final state.
+    if session.inflight_publishes:
+        return
+    try:
+        project = _loads(data)
+    except orjson.JSONDecodeError:
+        return
+    if not isinstance(project, dict):
+        return
+    session.last_project = project
+    session.last_ts = project_ts(project)
+    session.revision += 1
+    broadcast_text(session_id, _dumps(snapshot_payload(session_id, session)))
+
+
+def schedule_participants(session_id: str, session: Session):
+    # Join/leave storms (e.g. everyone reloading) collapse into one participants message.
+    if session.participants_task is None:
+        session.participants_task = asyncio.create_task(_participants_later(session_id, session, PARTICIPANTS_DELAY))
+
+
+async def _participants_later(session_id: str, session: Session, delay: float):
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        session.participants_task = None
+    if session.clients and sessions.get(session_id) is session:
+        broadcast(session_id, {"type": "participants", "sessionId": session_id, "clients": list(session.client_ids)})
+
+
+def project_ts(project: dict) -> float:
+    """``lastUpdatedAt`` of ``project``, or 0 when it is missing or not a number (it comes from clients)."""
+    ts = project.get("lastUpdatedAt")
+    return ts if isinstance(ts, (int, float)) and not isinstance(ts, bool) else 0
+
+
+def snapshot_payload(session_id: str, session: Session) -> dict:
+    return {"type": "project_snapshot", "sessionId": session_id, "rev": session.revision, "project": session.last_project}
+
 
 async def handler(ws):
     session_id = None
     client_id = ""
+    outbox = outboxes[ws] = Outbox(asyncio.Queue(MAX_OUTBOX))
+    writer = asyncio.create_task(_writer(ws, outbox))
     try:
         async for raw in ws:
+            # Every client message is a JSON object; reject anything else before paying for a parse.
+            if raw[:1] not in ("{", b"{"):
+                enqueue(ws, _ERR_NOT_OBJECT)
+                continue
             try:
-                msg = json.loads(raw)
-            except json.JSONDecodeError:
-                logging.warning("Invalid JSON from %s", ws.remote_address)
+                msg = _loads(raw)
+            except orjson.JSONDecodeError:
+                _log.warning("Invalid JSON from %s", ws.remote_address)
                 continue
 
             mtype = msg.get("type")
             session_id = msg.get("sessionId") or session_id
+            prev_client_id = client_id
             client_id = msg.get("clientId") or client_id or "guest"
             project = msg.get("project")
 
             if not session_id:
-                await send_json(ws, {"type": "error", "message": "sessionId required"})
+                enqueue(ws, _ERR_SESSION_ID)
                 continue
 
-            session = sessions.setdefault(session_id, Session())
-            session.clients.add(ws)
-            session.client_ids[ws] = client_id
+            session = sessions.get(session_id)
+            if session is None:
+                session = sessions[session_id] = Session(
+                    path=session_file(session_id),
+                    no_snapshot_text=_dumps({"type": "no_snapshot", "sessionId": session_id}),
+                )
+            session.add_client(ws, client_id)
+            if client_id != prev_client_id:
+                session.rename_client(ws, client_id)
 
             # Lazy-load persisted snapshot if memory has none.
-            if session.last_project is None:
-                session.last_project = load_session_project(session_id)
+            if session.last_project is None and not session.loaded:
+                if _redis is None:
+                    session.last_project = load_session_project(session.path)
+                else:
+                    loaded = await load_shared_project(session_id)
+                    # Another worker's snapshot may have landed while we were waiting.
+                    if session.last_project is None:
+                        session.last_project = loaded
+                session.loaded = True
+                if isinstance(session.last_project, dict):
+                    session.last_ts = project_ts(session.last_project)
 
             if mtype == "join":
-                logging.info("Client %s joined session %s", client_id, session_id)
+                if _log.isEnabledFor(logging.INFO):
+                    _log.info("Client %s joined session %s", client_id, session_id)
                 if session.last_project:
-                    await send_json(ws, {"type": "project_snapshot", "sessionId": session_id, "project": session.last_project})
-                await broadcast(session_id, {"type": "participants", "sessionId": session_id, "clients": list(session.client_ids.values())})
+                    send_json(ws, snapshot_payload(session_id, session))
+                schedule_participants(session_id, session)
                 continue
 
             if mtype == "request_snapshot":
                 if session.last_project:
-                    await send_json(ws, {"type": "project_snapshot", "sessionId": session_id, "project": session.last_project})
+                    send_json(ws, snapshot_payload(session_id, session))
                 else:
-                    await send_json(ws, {"type": "no_snapshot", "sessionId": session_id})
+                    enqueue(ws, session.no_snapshot_text)
                 continue
 
             # Both "update_project" and "project_snapshot" carry the latest full state from a client.
             # Store it server-side and broadcast to other clients so late joiners and active peers stay in sync.
-            if mtype in {"update_project", "project_snapshot"} and project:
+            if mtype in {"update_project", "project_snapshot"} and isinstance(project, dict) and project:
                 # Avoid overwriting newer state with older timestamps if provided
-                incoming_ts = project.get("lastUpdatedAt") if isinstance(project, dict) else None
-                current_ts = session.last_project.get("lastUpdatedAt") if isinstance(session.last_project, dict) else None
-                if current_ts and incoming_ts and incoming_ts < current_ts:
+                incoming_ts = project_ts(project)
+                if incoming_ts and incoming_ts < session.last_ts:
+                    # The sender already treats its project as synced; hand it the state that won.
+                    send_json(ws, snapshot_payload(session_id, session))
                     continue
                 session.last_project = project
-                save_session_project(session_id, project)
-                await broadcast(session_id, {"type": "project_snapshot", "sessionId": session_id, "project": project}, skip=ws)
+                session.last_ts = incoming_ts
+                session.revision += 1
+                schedule_save(session_id, session, project)
+                relay(session_id, _dumps(snapshot_payload(session_id, session)), skip=ws)
+                continue
+
+            # Incremental edits: apply ops last-writer-wins and relay only the ops to peers.
+            if mtype == "update_project_ops":
+                ops = msg.get("ops")
+                if session.last_project is None or not isinstance(ops, list):
+                    enqueue(ws, session.no_snapshot_text)
+                    continue
+                try:
+                    project = apply_patch(session.last_project, ops)
+                    if not isinstance(project, dict):
+                        raise TypeError("project must be an object")
+                    session.last_project = project
+                except (KeyError, IndexError, TypeError, ValueError) as exc:
+                    # The ops may have been partially applied; push the server state to everyone to reconverge.
+                    _log.warning("Failed to apply ops from %s in session %s: %s", client_id, session_id, exc)
+                    session.last_ts = project_ts(session.last_project)
+                    session.revision += 1
+                    schedule_save(session_id, session, session.last_project)
+                    relay(session_id, _dumps(snapshot_payload(session_id, session)))
+                    continue
+                session.last_ts = project_ts(project)
+                session.revision += 1
+                schedule_save(session_id, session, project)
+                relay(session_id, _dumps({"type": "patch", "sessionId": session_id, "rev": session.revision, "ops": ops}), skip=ws)
+                # A sender editing on a stale base gets the merged state back.
+                if msg.get("baseRev") != session.revision - 1:
+                    send_json(ws, snapshot_payload(session_id, session))
                 continue
 
             if mtype == "ping":
-                await send_json(ws, {"type": "pong"})
+                enqueue(ws, _PONG)
                 continue
 
     except websockets.ConnectionClosed:
         pass
     finally:
+        writer.cancel()
+        outboxes.pop(ws, None)
         if session_id and session_id in sessions:
-            sessions[session_id].clients.discard(ws)
-            sessions[session_id].client_ids.pop(ws, None)
-            if sessions[session_id].clients:
-                asyncio.create_task(broadcast(session_id, {"type": "participants", "sessionId": session_id, "clients": list(sessions[session_id].client_ids.values())}))
-            if not sessions[session_id].clients:
+            session = sessions[session_id]
+            session.remove_client(ws)
+            if session.clients:
+                schedule_participants(session_id, session)
+            # Keep the session around until a pending save lands so rejoining clients don't read stale data.
+            if not session.clients and session.pending_save is None:
                 sessions.pop(session_id, None)
-        logging.info("Client %s disconnected from session %s", ws.remote_address, session_id)
+        if _log.isEnabledFor(logging.INFO):
+            _log.info("Client %s disconnected from session %s", ws.remote_address, session_id)
 
 async def main():
-    async with websockets.serve(handler, HOST, PORT):
-        logging.info("WS server listening on %s:%s", HOST, PORT)
-        await asyncio.Future()  # run forever
+    global _redis
+    background = []  # hold references so the Redis tasks aren't garbage-collected
+    if REDIS_URL:
+        if aioredis is None:
+            raise RuntimeError("REDIS_URL is set but the redis package is not installed")
+        _redis = aioredis.from_url(REDIS_URL)
+        background = [asyncio.create_task(_publisher()), asyncio.create_task(_subscriber())]
+        _log.info("Sharing sessions through Redis")
+    try:
+        async with websockets.serve(handler, HOST, PORT, compression="deflate", max_size=MAX_MESSAGE_SIZE):
+            _log.info("WS server listening on %s:%s", HOST, PORT)
+            await asyncio.Future()  # run forever
+    finally:
+        flush_dirty_sessions()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:  # uvloop is optional and unavailable on Windows
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -0,0 +1,149 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import orjson
+import websockets
+
+import main
+from main import apply_patch, project_ts
+
+
+class ApplyPatchTest(unittest.TestCase):
+    def test_object_ops(self):
+        doc = {"a": 1, "b": {"c": 2}}
+        doc = apply_patch(doc, [
+            {"op": "replace", "path": "/a", "value": 3},
+            {"op": "add", "path": "/b/d", "value": [1]},
+            {"op": "remove", "path": "/b/c"},
+        ])
+        self.assertEqual(doc, {"a": 3, "b": {"d": [1]}})
+
+    def test_pointer_escapes(self):
+        doc = apply_patch({}, [
+            {"op": "add", "path": "/a~1b", "value": 1},
+            {"op": "add", "path": "/m~0n", "value": 2},
+        ])
+        self.assertEqual(doc, {"a/b": 1, "m~n": 2})
+
+    def test_list_ops(self):
+        doc = apply_patch({"l": [1, 2, 3]}, [
+            {"op": "add", "path": "/l/-", "value": 4},
+            {"op": "add", "path": "/l/0", "value": 0},
+            {"op": "replace", "path": "/l/1", "value": 9},
+            {"op": "remove", "path": "/l/4"},
+        ])
+        self.assertEqual(doc, {"l": [0, 9, 2, 3]})
+
+    def test_list_index_bounds(self):
+        # Appending at len() is allowed; anything past it, or negative, is not.
+        self.assertEqual(apply_patch([1], [{"op": "add", "path": "/1", "value": 2}]), [1, 2])
+        for op in (
+            {"op": "add", "path": "/2", "value": 0},
+            {"op": "replace", "path": "/1", "value": 0},
+            {"op": "remove", "path": "/1"},
+            {"op": "remove", "path": "/-1"},
+            {"op": "remove", "path": "/-"},
+        ):
+            with self.subTest(op=op), self.assertRaises((IndexError, ValueError)):
+                apply_patch([1], [op])
+
+    def test_root_replace(self):
+        self.assertEqual(apply_patch({"a": 1}, [{"op": "replace", "path": "", "value": {"b": 2}}]), {"b": 2})
+        with self.assertRaises(ValueError):
+            apply_patch({"a": 1}, [{"op": "remove", "path": ""}])
+
+    def test_malformed_ops(self):
+        for op in (
+            None,
+            "replace",
+            ["replace", "/a", 1],
+            {"op": "replace", "value": 1},
+            {"op": "replace", "path": 1, "value": 1},
+            {"op": "replace", "path": "a", "value": 1},
+            {"op": "move", "path": "/a", "value": 1},
+            {"path": "/a", "value": 1},
+        ):
+            with self.subTest(op=op), self.assertRaises(ValueError):
+                apply_patch({"a": 0}, [op])
+
+    def test_missing_targets(self):
+        with self.assertRaises(KeyError):
+            apply_patch({"a": 1}, [{"op": "replace", "path": "/b", "value": 1}])
+        with self.assertRaises(KeyError):
+            apply_patch({"a": 1}, [{"op": "remove", "path": "/b"}])
+        with self.assertRaises(KeyError):
+            apply_patch({"a": 1}, [{"op": "replace", "path": "/a"}])
+        with self.assertRaises(TypeError):
+            apply_patch({"a": 1}, [{"op": "add", "path": "/a/b", "value": 1}])
+
+
+class ProjectTsTest(unittest.TestCase):
+    def test_numbers(self):
+        self.assertEqual(project_ts({"lastUpdatedAt": 5}), 5)
+        self.assertEqual(project_ts({"lastUpdatedAt": 5.5}), 5.5)
+
+    def test_missing_or_invalid(self):
+        for value in (None, "zzz", "5", True, [1], {"a": 1}):
+            with self.subTest(value=value):
+                self.assertEqual(project_ts({"lastUpdatedAt": value}), 0)
+        self.assertEqual(project_ts({}), 0)
+
+
+class HandlerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(main, "DATA_DIR", Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(main.sessions.clear)
+        self.server = await websockets.serve(main.handler, "127.0.0.1", 0)
+        self.url = f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def connect(self, client_id: str):
+        ws = await websockets.connect(self.url)
+        self.addAsyncCleanup(ws.close)
+        await self.send(ws, {"type": "join", "sessionId": "s", "clientId": client_id})
+        return ws
+
+    async def send(self, ws, msg: dict):
+        await ws.send(orjson.dumps(msg).decode())
+
+    async def recv(self, ws, mtype: str) -> dict:
+        while True:
+            msg = orjson.loads(await asyncio.wait_for(ws.recv(), 2))
+            for item in msg["msgs"] if msg.get("type") == "batch" else [msg]:
+                if item.get("type") == mtype:
+                    return item
+
+    async def test_non_numeric_timestamp(self):
+        a = await self.connect("a")
+        b = await self.connect("b")
+        await self.send(a, {"type": "update_project", "sessionId": "s", "project": {"lastUpdatedAt": "zzz", "v": 1}})
+        self.assertEqual((await self.recv(b, "project_snapshot"))["project"]["v"], 1)
+        # A string timestamp patched in must not break later updates from other clients.
+        ops = [{"op": "replace", "path": "/lastUpdatedAt", "value": "x"}]
+        await self.send(a, {"type": "update_project_ops", "sessionId": "s", "baseRev": 1, "ops": ops})
+        await self.recv(b, "patch")
+        await self.send(b, {"type": "update_project", "sessionId": "s", "project": {"lastUpdatedAt": 7, "v": 2}})
+        self.assertEqual((await self.recv(a, "project_snapshot"))["project"]["v"], 2)
+
+    async def test_stale_update_gets_snapshot(self):
+        a = await self.connect("a")
+        b = await self.connect("b")
+        await self.send(a, {"type": "update_project", "sessionId": "s", "project": {"lastUpdatedAt": 10, "v": 1}})
+        await self.recv(b, "project_snapshot")
+        await self.send(b, {"type": "update_project", "sessionId": "s", "project": {"lastUpdatedAt": 5, "v": 2}})
+        snapshot = await self.recv(b, "project_snapshot")
+        self.assertEqual((snapshot["rev"], snapshot["project"]["v"]), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
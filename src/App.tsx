@@ -1,5 +1,6 @@
 import { useCallback, useEffect, useMemo, useRef, useState } from 'react'
 import './App.css'
+import { applyOps, diffOps, type PatchOp } from './jsonPatch.ts'
 
 type Prefab = {
   id: string
@@ -134,6 +135,9 @@ function App() {
   const wsRef = useRef<WebSocket | null>(null)
   const [clientId] = useState(() => `client-${Math.random().toString(16).slice(2, 8)}`)
   const applyingRemoteRef = useRef(false)
+  // Last project state known to the server and its revision, used to send incremental ops.
+  const syncedProjectRef = useRef<Project | null>(null)
+  const revisionRef = useRef(0)
 
   const surfaceRef = useRef<HTMLDivElement | null>(null)
   const canvasRef = useRef<HTMLCanvasElement | null>(null)
@@ -561,26 +565,59 @@ function App() {
       socket.onopen = () => {
         setWsStatus('connected')
         setAwaitingSnapshot(true)
+        syncedProjectRef.current = null
+        revisionRef.current = 0
         socket.send(JSON.stringify({ type: 'join', sessionId, clientId }))
         socket.send(JSON.stringify({ type: 'request_snapshot', sessionId, clientId }))
       }
 
       socket.onmessage = (event) => {
         try {
-          const msg = JSON.parse(event.data)
-          if (msg.type === 'project_snapshot' && msg.sessionId === sessionId && msg.project) {
-            const { isDragging: draggingNow, dragMode: draggingMode } = dragStateRef.current
-            if (draggingNow && draggingMode === 'move-entity') return
-            const incoming = ensureProjectDefaults(msg.project as Project)
-            applyingRemoteRef.current = true
-            setProject({ ...incoming })
-            setAwaitingSnapshot(false)
-          }
-          if (msg.type === 'no_snapshot' && msg.sessionId === sessionId) {
-            setAwaitingSnapshot(false)
-          }
-          if (msg.type === 'participants' && msg.sessionId === sessionId && Array.isArray(msg.clients)) {
-            setParticipants(msg.clients as string[])
+          const parsed = JSON.parse(event.data)
+          // The server folds queued messages into a single batch frame under load.
+          const msgs = parsed.type === 'batch' && Array.isArray(parsed.msgs) ? parsed.msgs : [parsed]
+          for (const msg of msgs) {
+            // One bad message must not drop the rest of its batch.
+            try {
+              if (msg.type === 'project_snapshot' && msg.sessionId === sessionId && msg.project) {
+                const { isDragging: draggingNow, dragMode: draggingMode } = dragStateRef.current
+                if (draggingNow && draggingMode === 'move-entity') continue
+                const incoming = ensureProjectDefaults(msg.project as Project)
+                syncedProjectRef.current = msg.project as Project
+                if (typeof msg.rev === 'number') revisionRef.current = msg.rev
+                applyingRemoteRef.current = true
+                setProject({ ...incoming })
+                setAwaitingSnapshot(false)
+              }
+              if (msg.type === 'patch' && msg.sessionId === sessionId && Array.isArray(msg.ops)) {
+                const { isDragging: draggingNow, dragMode: draggingMode } = dragStateRef.current
+                if (draggingNow && draggingMode === 'move-entity') continue
+                const synced = syncedProjectRef.current
+                if (!synced || msg.rev !== revisionRef.current + 1) {
+                  // Missed an update; fall back to a full snapshot.
+                  socket.send(JSON.stringify({ type: 'request_snapshot', sessionId, clientId }))
+                  continue
+                }
+                const next = applyOps(synced, msg.ops as PatchOp[]) as Project
+                syncedProjectRef.current = next
+                revisionRef.current = msg.rev
+                applyingRemoteRef.current = true
+                setProject(ensureProjectDefaults(next))
+              }
+              if (msg.type === 'no_snapshot' && msg.sessionId === sessionId) {
+                // Nothing stored server-side: drop any earlier baseline so the next edit goes out as a full update.
+                syncedProjectRef.current = null
+                revisionRef.current = 0
+                setAwaitingSnapshot(false)
+              }
+              if (msg.type === 'participants' && msg.sessionId === sessionId && Array.isArray(msg.clients)) {
+                setParticipants(msg.clients as string[])
+              }
+            } catch (err) {
+              console.warn('WS message error', msg?.type, err)
+              // applyOps copies on write, so a failed patch leaves the synced state intact; resync from the server.
+              if (msg?.type === 'patch') socket.send(JSON.stringify({ type: 'request_snapshot', sessionId, clientId }))
+            }
           }
         } catch (err) {
           console.warn('WS parse error', err)
@@ -630,8 +667,18 @@ function App() {
     }
     const socket = wsRef.current
     if (!socket || socket.readyState !== WebSocket.OPEN) return
-    const payload = { type: 'update_project', sessionId, clientId, project }
-    socket.send(JSON.stringify(payload))
+    const synced = syncedProjectRef.current
+    syncedProjectRef.current = project
+    if (!synced) {
+      // Nothing on the server to diff against yet: seed it with the full project.
+      socket.send(JSON.stringify({ type: 'update_project', sessionId, clientId, project }))
+      revisionRef.current += 1
+      return
+    }
+    const ops = diffOps(synced, project)
+    if (!ops.length) return
+    socket.send(JSON.stringify({ type: 'update_project_ops', sessionId, clientId, baseRev: revisionRef.current, ops }))
+    revisionRef.current += 1
   }, [project, wsStatus, sessionId, clientId, awaitingSnapshot])
 
   return (
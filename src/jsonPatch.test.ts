@@ -0,0 +1,106 @@
+import assert from 'node:assert/strict'
+import { describe, test } from 'node:test'
+import { applyOp, applyOps, diffOps, type PatchOp } from './jsonPatch.ts'
+
+describe('diffOps', () => {
+  test('returns nothing for shared references', () => {
+    const doc = { a: [1, 2], b: { c: 1 } }
+    assert.deepEqual(diffOps(doc, doc), [])
+    assert.deepEqual(diffOps(doc, { ...doc }), [])
+  })
+
+  test('emits object adds, removes and replaces', () => {
+    const ops = diffOps({ a: 1, b: 2, c: { d: 1 } }, { a: 1, c: { d: 2 }, e: 3 })
+    assert.deepEqual(ops, [
+      { op: 'remove', path: '/b' },
+      { op: 'replace', path: '/c/d', value: 2 },
+      { op: 'add', path: '/e', value: 3 },
+    ])
+  })
+
+  test('treats undefined fields as absent', () => {
+    assert.deepEqual(diffOps({ a: 1, b: undefined }, { a: undefined, c: undefined }), [{ op: 'remove', path: '/a' }])
+  })
+
+  test('removes trailing list items from the end', () => {
+    assert.deepEqual(diffOps([1, 2, 3], [1]), [
+      { op: 'remove', path: '/2' },
+      { op: 'remove', path: '/1' },
+    ])
+  })
+
+  test('escapes pointer segments', () => {
+    assert.deepEqual(diffOps({}, { 'a/b': 1, 'm~n': 2 }), [
+      { op: 'add', path: '/a~1b', value: 1 },
+      { op: 'add', path: '/m~0n', value: 2 },
+    ])
+  })
+
+  test('replaces the root when types differ', () => {
+    assert.deepEqual(diffOps([1], { a: 1 }), [{ op: 'replace', path: '', value: { a: 1 } }])
+  })
+
+  test('round-trips through applyOps', () => {
+    const prev = { name: 'a', entities: [{ id: '1', x: 0 }, { id: '2', x: 5 }], tags: { 'x/y': true } }
+    const next = { name: 'b', entities: [{ id: '1', x: 3 }, { id: '3', x: 1 }, { id: '4', x: 2 }], tags: {} }
+    assert.deepEqual(applyOps(prev, diffOps(prev, next)), next)
+    assert.deepEqual(applyOps(next, diffOps(next, prev)), prev)
+  })
+})
+
+describe('applyOp', () => {
+  test('copies on write', () => {
+    const doc = { a: { b: 1 }, c: [1] }
+    const next = applyOp(doc, { op: 'replace', path: '/a/b', value: 2 }) as typeof doc
+    assert.deepEqual(doc, { a: { b: 1 }, c: [1] })
+    assert.equal(next.c, doc.c)
+    assert.equal(next.a.b, 2)
+  })
+
+  test('applies list ops', () => {
+    const ops: PatchOp[] = [
+      { op: 'add', path: '/-', value: 4 },
+      { op: 'add', path: '/0', value: 0 },
+      { op: 'replace', path: '/1', value: 9 },
+      { op: 'remove', path: '/4' },
+    ]
+    assert.deepEqual(applyOps([1, 2, 3], ops), [0, 9, 2, 3])
+  })
+
+  test('checks list index bounds', () => {
+    assert.deepEqual(applyOp([1], { op: 'add', path: '/1', value: 2 }), [1, 2])
+    const bad: PatchOp[] = [
+      { op: 'add', path: '/2', value: 0 },
+      { op: 'replace', path: '/1', value: 0 },
+      { op: 'remove', path: '/1' },
+      { op: 'remove', path: '/-1' },
+      { op: 'remove', path: '/x' },
+      { op: 'replace', path: '/1/a', value: 0 },
+    ]
+    for (const op of bad) assert.throws(() => applyOp([1], op), undefined, op.path)
+  })
+
+  test('requires existing keys for replace and remove', () => {
+    assert.throws(() => applyOp({ a: 1 }, { op: 'replace', path: '/b', value: 2 }))
+    assert.throws(() => applyOp({ a: 1 }, { op: 'remove', path: '/b' }))
+    assert.throws(() => applyOp({}, { op: 'replace', path: '/toString', value: 2 }))
+    assert.deepEqual(applyOp({ a: 1 }, { op: 'add', path: '/b', value: 2 }), { a: 1, b: 2 })
+  })
+
+  test('replaces the root', () => {
+    assert.deepEqual(applyOp({ a: 1 }, { op: 'replace', path: '', value: { b: 2 } }), { b: 2 })
+    assert.throws(() => applyOp({ a: 1 }, { op: 'remove', path: '' }))
+  })
+
+  test('rejects malformed ops', () => {
+    const bad = [
+      { op: 'replace', path: 'a', value: 1 },
+      { op: 'replace', path: 1, value: 1 },
+      { op: 'replace', value: 1 },
+      { op: 'add', path: '/a/b', value: 1 },
+      { op: 'move', path: '/a', value: 1 },
+      { path: '/a', value: 1 },
+    ] as unknown as PatchOp[]
+    for (const op of bad) assert.throws(() => applyOp({ a: 0 }, op))
+  })
+})
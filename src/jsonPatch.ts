@@ -0,0 +1,71 @@
+export type PatchOp = {
+  op: 'add' | 'remove' | 'replace'
+  path: string
+  value?: unknown
+}
+
+const isPlainObject = (value: unknown): value is Record<string, unknown> =>
+  typeof value === 'object' && value !== null && !Array.isArray(value)
+const escapePointer = (key: string) => key.replace(/~/g, '~0').replace(/\//g, '~1')
+const unescapePointer = (key: string) => key.replace(/~1/g, '/').replace(/~0/g, '~')
+
+// JSON-Patch ops turning prev into next; subtrees shared by reference are skipped.
+export const diffOps = (prev: unknown, next: unknown, path = ''): PatchOp[] => {
+  if (prev === next) return []
+  if (Array.isArray(prev) && Array.isArray(next)) {
+    const ops: PatchOp[] = []
+    const shared = Math.min(prev.length, next.length)
+    for (let i = 0; i < shared; i += 1) ops.push(...diffOps(prev[i], next[i], `${path}/${i}`))
+    for (let i = shared; i < next.length; i += 1) ops.push({ op: 'add', path: `${path}/${i}`, value: next[i] })
+    for (let i = prev.length - 1; i >= shared; i -= 1) ops.push({ op: 'remove', path: `${path}/${i}` })
+    return ops
+  }
+  if (isPlainObject(prev) && isPlainObject(next)) {
+    const ops: PatchOp[] = []
+    // undefined fields are dropped by JSON.stringify, so treat them as absent.
+    for (const key of Object.keys(prev)) {
+      if (prev[key] !== undefined && next[key] === undefined) ops.push({ op: 'remove', path: `${path}/${escapePointer(key)}` })
+    }
+    for (const [key, value] of Object.entries(next)) {
+      if (value === undefined) continue
+      const childPath = `${path}/${escapePointer(key)}`
+      if (prev[key] === undefined) ops.push({ op: 'add', path: childPath, value })
+      else ops.push(...diffOps(prev[key], value, childPath))
+    }
+    return ops
+  }
+  return [{ op: 'replace', path, value: next }]
+}
+
+export const applyOp = (doc: unknown, { op, path, value }: PatchOp): unknown => {
+  if (op !== 'add' && op !== 'remove' && op !== 'replace') throw new Error(`Unsupported patch op ${op}`)
+  if (typeof path !== 'string' || (path && !path.startsWith('/'))) throw new Error(`Invalid patch path ${path}`)
+  const keys = path.split('/').slice(1).map(unescapePointer)
+  if (!keys.length && op === 'remove') throw new Error('Cannot remove the document root')
+  const walk = (node: unknown, depth: number): unknown => {
+    if (depth === keys.length) return value
+    const key = keys[depth]
+    const isLast = depth === keys.length - 1
+    if (Array.isArray(node)) {
+      const copy = [...node]
+      const index = key === '-' ? copy.length : /^\d+$/.test(key) ? Number(key) : -1
+      // Same bounds as the server: add may target one past the end, everything else an existing item.
+      if (index < 0 || index > copy.length - (isLast && op === 'add' ? 0 : 1)) throw new Error(`Invalid patch index ${path}`)
+      if (!isLast) copy[index] = walk(copy[index], depth + 1)
+      else if (op === 'add') copy.splice(index, 0, value)
+      else if (op === 'remove') copy.splice(index, 1)
+      else copy[index] = value
+      return copy
+    }
+    if (!isPlainObject(node)) throw new Error(`Invalid patch path ${path}`)
+    const copy = { ...node }
+    if (!isLast) copy[key] = walk(copy[key], depth + 1)
+    else if (op !== 'add' && !Object.hasOwn(node, key)) throw new Error(`Missing patch target ${path}`)
+    else if (op === 'remove') delete copy[key]
+    else copy[key] = value
+    return copy
+  }
+  return walk(doc, 0)
+}
+
+export const applyOps = (doc: unknown, ops: PatchOp[]) => ops.reduce(applyOp, doc)